@@ -24,56 +24,94 @@ from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet
 from docx import Document
 
+# Folha de estilos do ReportLab construída uma única vez no carregamento do módulo
+_STYLES = getSampleStyleSheet()
+
 # ---------- Funções utilitárias ----------
-def calc_qtd_necessaria(medida: float, cobertura_por_unidade: float, desperdicio_pct: float) -> float:
-    if cobertura_por_unidade <= 0:
-        return 0.0
-    fator = 1 + (desperdicio_pct or 0) / 100.0
-    return (medida / cobertura_por_unidade) * fator
+def _now_str() -> str:
+    return datetime.now().strftime('%d/%m/%Y %H:%M')
+
+# Colunas fixas de cada item; os itens ficam armazenados por coluna (dict de listas)
+KNOWN_COLS = [
+    "Material", "Medida", "Cobertura por Unidade", "Unidade",
+    "Desperdício (%)", "Qtd Necessária", "Preço Unitário", "Subtotal",
+]
+
+def novos_items() -> dict:
+    items = {col: [] for col in KNOWN_COLS}
+    items["_extras"] = []  # campos específicos do material, um dict por item
+    return items
 
 def add_item(material: str, medida: float, cobertura: float, unidade: str,
-             desperdicio: float, preco_unit: float, especificacoes: dict):
-    qtd = calc_qtd_necessaria(medida, cobertura, desperdicio)
-    qtd = round(qtd, 3)
+             desperdicio: float, preco_unit: float, especificacoes: dict) -> bool:
+    # itens sem medida ou cobertura não entram no orçamento
+    if medida <= 0 or cobertura <= 0:
+        st.warning("Medida/cobertura inválida")
+        return False
+    qtd = round((medida / cobertura) * (1 + (desperdicio or 0) / 100.0), 3)
     subtotal = round((preco_unit or 0.0) * qtd, 2)
-    item = {
-        "Material": material,
-        "Medida": medida,                       # m² ou m³ conforme o caso
-        "Cobertura por Unidade": cobertura,     # quanto 1 unidade cobre (m² ou m³)
-        "Unidade": unidade,                     # lata, saco, peça, m³, m², un etc.
-        "Desperdício (%)": desperdicio,
-        "Qtd Necessária": qtd,
-        "Preço Unitário": float(preco_unit or 0.0),
-        "Subtotal": subtotal,
-    }
-    item.update(especificacoes)  # adiciona campos extras específicos do material
-    st.session_state["items"].append(item)
+    valores = (
+        material,
+        medida,                     # m² ou m³ conforme o caso
+        cobertura,                  # quanto 1 unidade cobre (m² ou m³)
+        unidade,                    # lata, saco, peça, m³, m², un etc.
+        desperdicio,
+        qtd,
+        float(preco_unit or 0.0),
+        subtotal,
+    )
+    items = st.session_state["items"]
+    for col, valor in zip(KNOWN_COLS, valores):
+        items[col].append(valor)
+    items["_extras"].append(dict(especificacoes))
+    # invalida o DataFrame em cache e atualiza a soma corrente dos subtotais
+    st.session_state["items_df"] = None
+    st.session_state["subtotal_sum"] += subtotal
+    return True
 
 def df_resumo() -> pd.DataFrame:
-    data = st.session_state.get("items", [])
-    return pd.DataFrame(data) if data else pd.DataFrame()
+    # reaproveita o DataFrame entre reruns; só é reconstruído após add_item
+    if st.session_state.get("items_df") is None:
+        items = st.session_state["items"]
+        if not items["Material"]:
+            df = pd.DataFrame()
+        else:
+            df = pd.DataFrame({col: items[col] for col in KNOWN_COLS}, copy=False)
+            # poucos valores distintos: categorias economizam memória e conversões
+            df["Material"] = df["Material"].astype("category")
+            df["Unidade"] = df["Unidade"].astype("category")
+            # os campos extras só são mesclados quando algum item os possui
+            if any(items["_extras"]):
+                df = pd.concat([df, pd.DataFrame(items["_extras"])], axis=1)
+        st.session_state["items_df"] = df
+    return st.session_state["items_df"]
 
+# Cache global do processo: limitado em entradas e tempo para não crescer sem fim
+@st.cache_data(show_spinner=False, max_entries=32, ttl=3600)
 def make_excel_bytes(df: pd.DataFrame) -> bytes:
     buffer = io.BytesIO()
     with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
         df.to_excel(writer, index=False, sheet_name="Orçamento")
     return buffer.getvalue()
 
-def make_pdf_bytes(df: pd.DataFrame, projeto: str, cliente: str, responsavel: str, custos_extra: dict) -> bytes:
+@st.cache_data(show_spinner=False, max_entries=32, ttl=3600)
+def make_pdf_bytes(df: pd.DataFrame, projeto: str, cliente: str, responsavel: str, totals: dict, ts: str) -> bytes:
+    # Mantido em memória: o retorno passa pelo st.cache_data (precisa ser picklável)
+    # e o st.download_button carrega o conteúdo inteiro de qualquer forma.
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=24, leftMargin=24, topMargin=24, bottomMargin=24)
-    styles = getSampleStyleSheet()
+    styles = _STYLES
     story = []
 
     titulo = f"Orçamento de Materiais — {projeto}"
     story.append(Paragraph(titulo, styles["Title"]))
-    meta = f"Cliente: {cliente or '-'} | Responsável: {responsavel or '-'} | Data: {datetime.now().strftime('%d/%m/%Y %H:%M')}"
+    meta = f"Cliente: {cliente or '-'} | Responsável: {responsavel or '-'} | Data: {ts}"
     story.append(Paragraph(meta, styles["Normal"]))
     story.append(Spacer(1, 12))
 
     if not df.empty:
         header = list(df.columns)
-        data = [header] + [[str(r[c]) for c in df.columns] for _, r in df.iterrows()]
+        data = [header] + df.astype(str).values.tolist()
         t = Table(data, repeatRows=1)
         t.setStyle(TableStyle([
             ("BACKGROUND", (0,0), (-1,0), colors.lightgrey),
@@ -81,54 +119,94 @@ def make_pdf_bytes(df: pd.DataFrame, projeto: str, cliente: str, responsavel: st
         ]))
         story.append(t)
         story.append(Spacer(1, 12))
-        total = float(df["Subtotal"].sum()) if "Subtotal" in df.columns else 0.0
-        total_final = total + float(custos_extra.get("mao_obra", 0)) + float(custos_extra.get("impostos", 0))
-        story.append(Paragraph(f"<b>Materiais:</b> R$ {total:.2f}", styles["Normal"]))
-        story.append(Paragraph(f"<b>Mão de obra:</b> R$ {float(custos_extra.get('mao_obra',0)):.2f}", styles["Normal"]))
-        story.append(Paragraph(f"<b>Impostos:</b> R$ {float(custos_extra.get('impostos',0)):.2f}", styles["Normal"]))
-        story.append(Paragraph(f"<b>Total:</b> R$ {total_final:.2f}", styles["Heading3"]))
+        # parcelas num único parágrafo; o total segue como título próprio
+        totals_html = (
+            f"<b>Materiais:</b> R$ {totals['mat']:.2f}<br/>"
+            f"<b>Mão de obra:</b> R$ {totals['mo']:.2f}<br/>"
+            f"<b>Impostos:</b> R$ {totals['imp']:.2f}"
+        )
+        story.append(Paragraph(totals_html, styles["Normal"]))
+        story.append(Paragraph(f"<b>Total:</b> R$ {totals['total']:.2f}", styles["Heading3"]))
 
     doc.build(story)
     return buffer.getvalue()
 
+@st.cache_data(show_spinner=False, max_entries=32, ttl=3600)
 def make_csv_bytes(df: pd.DataFrame) -> bytes:
-    return df.to_csv(index=False, sep=";").encode("utf-8")
+    # escreve direto no buffer binário, sem gerar a str intermediária
+    buffer = io.BytesIO()
+    df.to_csv(buffer, index=False, sep=";", encoding="utf-8")
+    return buffer.getvalue()
 
-def make_docx_bytes(df: pd.DataFrame, projeto: str, cliente: str, responsavel: str, custos_extra: dict) -> bytes:
+@st.cache_data(show_spinner=False, max_entries=32, ttl=3600)
+def make_docx_bytes(df: pd.DataFrame, projeto: str, cliente: str, responsavel: str, totals: dict, ts: str) -> bytes:
     doc = Document()
     doc.add_heading(f"Orçamento de Materiais — {projeto}", 0)
     doc.add_paragraph(f"Cliente: {cliente or '-'}")
     doc.add_paragraph(f"Responsável: {responsavel or '-'}")
-    doc.add_paragraph(f"Data: {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+    doc.add_paragraph(f"Data: {ts}")
     doc.add_paragraph("")
 
     if not df.empty:
-        table = doc.add_table(rows=1, cols=len(df.columns))
-        hdr_cells = table.rows[0].cells
-        for i, col in enumerate(df.columns):
-            hdr_cells[i].text = col
-        for _, row in df.iterrows():
-            row_cells = table.add_row().cells
-            for i, val in enumerate(row):
-                row_cells[i].text = str(val)
-
-        total = float(df["Subtotal"].sum()) if "Subtotal" in df.columns else 0.0
-        total_final = total + float(custos_extra.get("mao_obra", 0)) + float(custos_extra.get("impostos", 0))
-        doc.add_paragraph(f"Materiais: R$ {total:.2f}")
-        doc.add_paragraph(f"Mão de obra: R$ {float(custos_extra.get('mao_obra',0)):.2f}")
-        doc.add_paragraph(f"Impostos: R$ {float(custos_extra.get('impostos',0)):.2f}")
-        doc.add_heading(f"Total: R$ {total_final:.2f}", level=1)
+        # todas as linhas são alocadas de uma vez, sem add_row() por item;
+        # table.rows é um proxy que refaz a lista a cada índice, por isso o list()
+        table = doc.add_table(rows=len(df) + 1, cols=len(df.columns))
+        rows = list(table.rows)
+        for cell, col in zip(rows[0].cells, df.columns):
+            cell.text = col
+        for tr, row in zip(rows[1:], df.astype(str).itertuples(index=False, name=None)):
+            for cell, val in zip(tr.cells, row):
+                cell.text = val
+
+        doc.add_paragraph(f"Materiais: R$ {totals['mat']:.2f}")
+        doc.add_paragraph(f"Mão de obra: R$ {totals['mo']:.2f}")
+        doc.add_paragraph(f"Impostos: R$ {totals['imp']:.2f}")
+        doc.add_heading(f"Total: R$ {totals['total']:.2f}", level=1)
 
     buffer = io.BytesIO()
     doc.save(buffer)
     return buffer.getvalue()
 
 # ---------- App ----------
+PAGE = 200  # itens exibidos no resumo quando "Mostrar tudo" está desligado
+
+# Campos extras por material: (nome da coluna, widget, argumentos do widget)
+MATERIAL_EXTRAS = {
+    "Madeira": [
+        ("Medidas (m)", st.text_input, {"label": "Medidas da madeira (ex: 2.5 x 0.1 x 0.03)"}),
+    ],
+    "Cola": [
+        ("Tipo", st.selectbox, {"label": "Tipo de cola", "options": ["Hidráulica", "Madeira", "Universal", "PVC"]}),
+    ],
+    "Canos": [
+        ("Diâmetro", st.text_input, {"label": "Diâmetro do cano (mm)"}),
+        ("Uso", st.selectbox, {"label": "Uso do cano", "options": ["Pia", "Privada", "Esgoto", "Água fria", "Água quente", "Pluvial"]}),
+    ],
+    "Janelas": [
+        ("Altura (m)", st.number_input, {"label": "Altura da janela (m)", "min_value": 0.0, "step": 0.1}),
+        ("Largura (m)", st.number_input, {"label": "Largura da janela (m)", "min_value": 0.0, "step": 0.1}),
+    ],
+    "Blocos": [
+        ("Medida do bloco (cm)", st.text_input, {"label": "Medida do bloco (ex: 14x19x39)"}),
+    ],
+    "Tijolos": [
+        ("Medida do tijolo (cm)", st.text_input, {"label": "Medida do tijolo (ex: 9x19x29)"}),
+    ],
+    "Areia": [
+        ("Tipo de areia", st.selectbox, {"label": "Tipo de areia", "options": ["Fina", "Média", "Grossa"]}),
+    ],
+    "Brita": [
+        ("Tipo de brita", st.selectbox, {"label": "Tipo de brita", "options": ["Nº 0", "Nº 1", "Nº 2", "Nº 3"]}),
+    ],
+}
+
 st.title("📐 Orçamento de Materiais de Construção")
 
-# Inicializa session_state["items"]
+# Inicializa session_state["items"] e os caches derivados
 if "items" not in st.session_state:
-    st.session_state["items"] = []
+    st.session_state["items"] = novos_items()
+    st.session_state["items_df"] = None
+    st.session_state["subtotal_sum"] = 0.0
 
 projeto = st.text_input("Nome do Projeto")
 cliente = st.text_input("Cliente")
@@ -149,48 +227,40 @@ preco_unit = st.number_input("Preço unitário (R$)", min_value=0.0, step=0.1)
 
 # Campos extras por material
 especificacoes = {}
-if material == "Madeira":
-    especificacoes["Medidas (m)"] = st.text_input("Medidas da madeira (ex: 2.5 x 0.1 x 0.03)")
-elif material == "Cola":
-    especificacoes["Tipo"] = st.selectbox("Tipo de cola", ["Hidráulica", "Madeira", "Universal", "PVC"])
-elif material == "Canos":
-    especificacoes["Diâmetro"] = st.text_input("Diâmetro do cano (mm)")
-    especificacoes["Uso"] = st.selectbox("Uso do cano", ["Pia", "Privada", "Esgoto", "Água fria", "Água quente", "Pluvial"])
-elif material == "Janelas":
-    especificacoes["Altura (m)"] = st.number_input("Altura da janela (m)", min_value=0.0, step=0.1)
-    especificacoes["Largura (m)"] = st.number_input("Largura da janela (m)", min_value=0.0, step=0.1)
-elif material == "Blocos":
-    especificacoes["Medida do bloco (cm)"] = st.text_input("Medida do bloco (ex: 14x19x39)")
-elif material == "Tijolos":
-    especificacoes["Medida do tijolo (cm)"] = st.text_input("Medida do tijolo (ex: 9x19x29)")
-elif material == "Areia":
-    especificacoes["Tipo de areia"] = st.selectbox("Tipo de areia", ["Fina", "Média", "Grossa"])
-elif material == "Brita":
-    especificacoes["Tipo de brita"] = st.selectbox("Tipo de brita", ["Nº 0", "Nº 1", "Nº 2", "Nº 3"])
+for nome, widget, kw in MATERIAL_EXTRAS.get(material, []):
+    especificacoes[nome] = widget(**kw)
 
 if st.button("Adicionar Material"):
-    add_item(material, medida, cobertura, unidade, desperdicio, preco_unit, especificacoes)
-    st.success(f"{material} adicionado ao orçamento!")
+    if add_item(material, medida, cobertura, unidade, desperdicio, preco_unit, especificacoes):
+        st.success(f"{material} adicionado ao orçamento!")
 
 st.subheader("Resumo dos Itens")
 df = df_resumo()
 if not df.empty:
-    st.dataframe(df)
+    # só os últimos itens vão para o navegador; as exportações usam o df completo
+    mostrar_tudo = st.toggle("Mostrar tudo", value=False)
+    st.dataframe(df if mostrar_tudo else df.tail(PAGE), hide_index=True)
 
     st.subheader("Custos Extras")
     mao_obra = st.number_input("Custo de mão de obra (R$)", min_value=0.0, step=0.1)
     impostos = st.number_input("Impostos (R$)", min_value=0.0, step=0.1)
-    custos_extra = {"mao_obra": mao_obra, "impostos": impostos}
-
-    total = float(df["Subtotal"].sum()) if "Subtotal" in df.columns else 0.0
-    total_final = total + mao_obra + impostos
-    st.write(f"**Total Materiais:** R$ {total:.2f}")
-    st.write(f"**Total Final (com mão de obra e impostos):** R$ {total_final:.2f}")
+    # totais calculados uma única vez e repassados aos exportadores
+    totals = {"mat": st.session_state["subtotal_sum"], "mo": float(mao_obra), "imp": float(impostos)}
+    totals["total"] = totals["mat"] + totals["mo"] + totals["imp"]
+    st.write(f"**Total Materiais:** R$ {totals['mat']:.2f}")
+    st.write(f"**Total Final (com mão de obra e impostos):** R$ {totals['total']:.2f}")
 
     st.subheader("Exportar Orçamento")
-    st.download_button("📊 Baixar Excel", make_excel_bytes(df), "orcamento.xlsx")
-    st.download_button("📄 Baixar PDF", make_pdf_bytes(df, projeto, cliente, responsavel, custos_extra), "orcamento.pdf")
-    st.download_button("📝 Baixar CSV", make_csv_bytes(df), "orcamento.csv")
-    st.download_button("📑 Baixar DOCX", make_docx_bytes(df, projeto, cliente, responsavel, custos_extra), "orcamento.docx")
+    # só o formato escolhido é gerado; os builders são cacheados por conteúdo
+    formato = st.selectbox("Formato", ["Excel", "PDF", "CSV", "DOCX"])
+    ts = _now_str()
+    if formato == "Excel":
+        st.download_button("📊 Baixar Excel", make_excel_bytes(df), "orcamento.xlsx")
+    elif formato == "PDF":
+        st.download_button("📄 Baixar PDF", make_pdf_bytes(df, projeto, cliente, responsavel, totals, ts), "orcamento.pdf")
+    elif formato == "CSV":
+        st.download_button("📝 Baixar CSV", make_csv_bytes(df), "orcamento.csv")
+    elif formato == "DOCX":
+        st.download_button("📑 Baixar DOCX", make_docx_bytes(df, projeto, cliente, responsavel, totals, ts), "orcamento.docx")
 else:
     st.info("Nenhum item adicionado ainda.")
\ No newline at end of file